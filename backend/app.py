@@ -6,24 +6,54 @@ Author: Kajal Meshram
 Date: 2025
 """
 
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify, stream_with_context
+from flask.json.provider import DefaultJSONProvider
 from flask_cors import CORS
 from flask_limiter import Limiter
 from flask_limiter.util import get_remote_address
+from gevent import monkey
+from limits.storage import MemoryStorage
+import atexit
 import os
-from datetime import datetime, timedelta
+import queue
+import time
+from collections import OrderedDict
+from hashlib import md5, sha256
 import sqlite3
-from typing import Dict, List, Optional, Literal
+from typing import Dict, Iterator, List, Optional, Literal, Tuple
 import google.generativeai as genai
 from dotenv import load_dotenv
-import json
+import orjson
 import re
+import threading
 import traceback
 from pydantic import BaseModel, Field
 
 load_dotenv()
 
+# Under gevent workers, grpc's C core only yields to other greenlets once its
+# gevent integration is enabled; it must happen before any channel is created
+if monkey.is_module_patched('socket'):
+    from grpc.experimental import gevent as grpc_gevent
+    grpc_gevent.init_gevent()
+
+class OrjsonProvider(DefaultJSONProvider):
+    """Route jsonify() and request.get_json() through orjson"""
+    
+    def dumps(self, obj, **kwargs) -> str:
+        return orjson.dumps(obj).decode()
+    
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+    
+    def response(self, *args, **kwargs) -> Response:
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(orjson.dumps(obj), mimetype=self.mimetype)
+
 app = Flask(__name__)
+app.json = OrjsonProvider(app)
+# 2000 characters of UTF-8 symptoms plus metadata fit well within 16 KB
+app.config['MAX_CONTENT_LENGTH'] = 16 * 1024
 
 CORS(app, resources={
     r"/api/*": {
@@ -34,11 +64,90 @@ CORS(app, resources={
 })
 
 
+class _WindowEntry:
+    """One acquired hit in a moving window"""
+    __slots__ = ('atime', 'expiry')
+    
+    def __init__(self, atime: float, expiry: int):
+        self.atime = atime
+        self.expiry = atime + expiry
+
+class BoundedMemoryStorage(MemoryStorage):
+    """
+    In-memory moving-window storage with bounded memory.
+    The stock MemoryStorage keeps an (empty) event list for every key it has
+    ever seen, so per-IP state grows with each new client. Here all event state
+    sits in one LRU-ordered dict behind a single storage-wide lock: idle keys
+    are dropped as soon as their newest hit expires, and the key count is
+    capped at MAX_KEYS by evicting the least recently used.
+    """
+    
+    STORAGE_SCHEME = ["bounded-memory"]
+    MAX_KEYS = 10000
+    
+    def __init__(self, uri: Optional[str] = None, **options):
+        super().__init__(uri, **options)
+        # Expiry happens inline under _events_lock; the base timer would walk
+        # events without it
+        self.timer.cancel()
+        self.events = OrderedDict()
+        self._events_lock = threading.Lock()
+    
+    def _prune(self, now: float):
+        """Drop keys whose newest hit has expired, then enforce MAX_KEYS"""
+        while self.events:
+            events = next(iter(self.events.values()))
+            if events and events[0].expiry > now:
+                break
+            self.events.popitem(last=False)
+        while len(self.events) > self.MAX_KEYS:
+            self.events.popitem(last=False)
+    
+    def acquire_entry(self, key: str, limit: int, expiry: int, amount: int = 1) -> bool:
+        if amount > limit:
+            return False
+        
+        with self._events_lock:
+            now = time.time()
+            # Newest first; trailing expired hits can never affect a window again
+            events = self.events.setdefault(key, [])
+            self.events.move_to_end(key)
+            while events and events[-1].expiry <= now:
+                events.pop()
+            
+            entry = events[limit - amount] if len(events) > limit - amount else None
+            acquired = not (entry and entry.atime >= now - expiry)
+            if acquired:
+                events[:0] = [_WindowEntry(now, expiry)] * amount
+            
+            self._prune(now)
+            return acquired
+    
+    def get_moving_window(self, key: str, limit: int, expiry: int) -> Tuple[float, int]:
+        with self._events_lock:
+            now = time.time()
+            events = self.events.get(key, [])
+            count = sum(1 for event in events if event.atime >= now - expiry)
+            if count:
+                return events[count - 1].atime, count
+            return now, 0
+    
+    def clear(self, key: str):
+        with self._events_lock:
+            super().clear(key)
+    
+    def reset(self) -> Optional[int]:
+        with self._events_lock:
+            return super().reset()
+
+
 limiter = Limiter(
     app=app,
     key_func=get_remote_address,
     default_limits=["100 per hour", "20 per minute"],
-    storage_uri="memory://"
+    # Moving window avoids the burst-at-boundary doubling of fixed windows
+    strategy="moving-window",
+    storage_uri="bounded-memory://"
 )
 
 
@@ -57,34 +166,91 @@ class SymptomAnalysisSchema(BaseModel):
     urgency: Literal["urgent", "soon", "routine"] = Field(description="Classification of required follow-up time.")
     recommendations: List[str] = Field(description="5 to 7 specific, actionable recommendations for the patient.")
 
+# ==================== TIMESTAMPS ====================
+
+# (epoch second, ISO string) swapped as one tuple so readers never see a torn pair
+_ts_cache = (0, '')
+
+def iso_now() -> str:
+    """UTC ISO-8601 timestamp with per-second resolution, formatted once per second"""
+    global _ts_cache
+    now = int(time.time())
+    if _ts_cache[0] != now:
+        _ts_cache = (now, time.strftime('%Y-%m-%dT%H:%M:%S', time.gmtime(now)))
+    return _ts_cache[1]
+
 # ==================== DATABASE FUNCTIONS ====================
 
+# Single shared connection (autocommit) reused by every request; access is
+# serialized through db_lock since sqlite3 connections are not thread-safe.
+DB = sqlite3.connect('symptom_checker.db', check_same_thread=False, isolation_level=None)
+db_lock = threading.Lock()
+
+# Clustered on (session_id, id) so history lookups land directly on the rows.
+# id is allocated per session in store_query since AUTOINCREMENT needs a rowid.
+SYMPTOM_QUERIES_DDL = '''
+    CREATE TABLE IF NOT EXISTS {table} (
+        id INTEGER NOT NULL,
+        timestamp TEXT NOT NULL,
+        symptoms TEXT NOT NULL,
+        age INTEGER,
+        gender TEXT,
+        duration TEXT,
+        severity TEXT,
+        conditions TEXT,
+        recommendations TEXT,
+        urgency_level TEXT,
+        session_id TEXT NOT NULL,
+        created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+        PRIMARY KEY (session_id, id)
+    ) WITHOUT ROWID
+'''
+
 def init_db():
     """Initialize SQLite database for storing query history"""
     try:
-        conn = sqlite3.connect('symptom_checker.db')
-        c = conn.cursor()
+        c = DB.cursor()
         
-        c.execute('''
-            CREATE TABLE IF NOT EXISTS symptom_queries (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                timestamp TEXT NOT NULL,
-                symptoms TEXT NOT NULL,
-                age INTEGER,
-                gender TEXT,
-                duration TEXT,
-                severity TEXT,
-                conditions TEXT,
-                recommendations TEXT,
-                urgency_level TEXT,
-                session_id TEXT,
-                created_at DATETIME DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
+        # WAL lets readers run alongside the writer; NORMAL sync is safe under WAL
+        c.execute('PRAGMA journal_mode=WAL')
+        c.execute('PRAGMA synchronous=NORMAL')
+        c.execute('PRAGMA temp_store=MEMORY')
+        c.execute('PRAGMA cache_size=-20000')
+        
+        c.execute(SYMPTOM_QUERIES_DDL.format(table='symptom_queries'))
         
+        # One-shot migration from the original rowid/AUTOINCREMENT layout.
+        # IMMEDIATE takes the write lock up front so that when several server
+        # workers start together only the first one migrates.
+        c.execute('BEGIN IMMEDIATE')
+        table_sql = c.execute(
+            "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'symptom_queries'"
+        ).fetchone()[0]
+        if 'WITHOUT ROWID' not in table_sql.upper():
+            c.execute('DROP TABLE IF EXISTS symptom_queries_new')
+            c.execute(SYMPTOM_QUERIES_DDL.format(table='symptom_queries_new'))
+            c.execute('''
+                INSERT INTO symptom_queries_new
+                (id, timestamp, symptoms, age, gender, duration, severity,
+                 conditions, recommendations, urgency_level, session_id, created_at)
+                SELECT id, timestamp, symptoms, age, gender, duration, severity,
+                       conditions, recommendations, urgency_level,
+                       COALESCE(session_id, ''), created_at
+                FROM symptom_queries
+            ''')
+            c.execute('DROP TABLE symptom_queries')
+            c.execute('ALTER TABLE symptom_queries_new RENAME TO symptom_queries')
+            print("🔄 Migrated symptom_queries to WITHOUT ROWID layout")
+        c.execute('COMMIT')
+        
+        # Matches the history query (filter by session, newest first, id breaking
+        # same-second ties) so SQLite can walk the index instead of sorting in a
+        # temp B-tree. Older layouts of this index are replaced.
+        c.execute('DROP INDEX IF EXISTS idx_session_id')
+        c.execute('DROP INDEX IF EXISTS idx_session_ts')
         c.execute('''
-            CREATE INDEX IF NOT EXISTS idx_session_id 
-            ON symptom_queries(session_id)
+            CREATE INDEX IF NOT EXISTS idx_session_ts_id 
+            ON symptom_queries(session_id, timestamp DESC, id DESC)
         ''')
         
         c.execute('''
@@ -92,18 +258,238 @@ def init_db():
             ON symptom_queries(timestamp)
         ''')
         
-        conn.commit()
-        conn.close()
+        c.execute('''
+            CREATE INDEX IF NOT EXISTS idx_urgency 
+            ON symptom_queries(urgency_level)
+        ''')
+        
+        # Populate sqlite_stat1 so the planner picks the narrow indexes from the
+        # first query; analysis_limit keeps this cheap on large tables
+        c.execute('PRAGMA analysis_limit=1000')
+        c.execute('ANALYZE')
+        
         print("✅ Database initialized successfully")
         
     except Exception as e:
+        if DB.in_transaction:
+            DB.execute('ROLLBACK')
         print(f"❌ Database initialization error: {str(e)}")
 
+DB_OPTIMIZE_INTERVAL = 15 * 60  # seconds
+
+def optimize_db():
+    """Re-analyze tables whose contents changed enough to affect query plans"""
+    try:
+        with db_lock:
+            DB.execute('PRAGMA optimize')
+    except Exception as e:
+        print(f"❌ Database optimize error: {str(e)}")
+
+def _schedule_db_optimize():
+    """Run optimize_db every DB_OPTIMIZE_INTERVAL seconds on a daemon timer"""
+    def run():
+        optimize_db()
+        _schedule_db_optimize()
+    
+    timer = threading.Timer(DB_OPTIMIZE_INTERVAL, run)
+    timer.daemon = True
+    timer.start()
+
 # Initialize database
 init_db()
+_schedule_db_optimize()
+atexit.register(optimize_db)
 
 # ==================== SYMPTOM ANALYZER CLASS ====================
 
+EMERGENCY_KEYWORDS = [
+    'chest pain', 'chest pressure', 'heart attack',
+    'difficulty breathing', "can't breathe", 'shortness of breath',
+    'severe bleeding', 'bleeding heavily', 'blood loss',
+    'stroke', 'can\'t move arm', 'face drooping',
+    'seizure', 'convulsion',
+    'unconscious', 'passed out', 'fainted',
+    'severe headache', 'worst headache',
+    'coughing blood', 'vomiting blood',
+    'severe abdominal pain', 'severe stomach pain'
+]
+
+# Single-pass multi-keyword matcher built once at import. pyahocorasick is
+# preferred; without it a compiled alternation of the literals is used instead.
+try:
+    import ahocorasick
+    
+    EMERGENCY_AUTOMATON = ahocorasick.Automaton()
+    for _keyword in EMERGENCY_KEYWORDS:
+        EMERGENCY_AUTOMATON.add_word(_keyword, _keyword)
+    EMERGENCY_AUTOMATON.make_automaton()
+    
+    def find_emergency_keywords(text: str) -> set:
+        """Return the emergency keywords present in already-lowercased text"""
+        return {keyword for _, keyword in EMERGENCY_AUTOMATON.iter(text)}
+except ImportError:
+    # Longest first so overlapping alternatives prefer the more specific phrase
+    EMERGENCY_RE = re.compile('|'.join(
+        re.escape(keyword) for keyword in sorted(EMERGENCY_KEYWORDS, key=len, reverse=True)
+    ))
+    
+    def find_emergency_keywords(text: str) -> set:
+        """Return the emergency keywords present in already-lowercased text"""
+        return set(EMERGENCY_RE.findall(text))
+
+# Static prompt text is built once; only the patient fields are filled per request
+_PROMPT_FIELDS = ('symptoms', 'age', 'gender', 'duration', 'severity')
+_PROMPT_TEMPLATE = """You are an expert medical AI assistant providing preliminary symptom assessment for EDUCATIONAL PURPOSES ONLY.
+
+=== PATIENT INFORMATION ===
+Symptoms: {symptoms}
+Age: {age}
+Gender: {gender}
+Duration: {duration}
+Severity Level: {severity}
+
+=== YOUR TASK ===
+Analyze the symptoms and provide a preliminary assessment. The output MUST strictly adhere to the provided JSON Schema (SymptomAnalysisSchema).
+
+=== ANALYSIS GUIDELINES ===
+
+1. POSSIBLE CONDITIONS:
+    - List 2-4 most probable conditions based on symptoms
+    - Order by probability (most likely first)
+    - Use the defined probability and severity levels only.
+
+2. URGENCY CLASSIFICATION:
+    - Use "urgent", "soon", or "routine". Classify based on the severity of the most probable condition and the presence of emergency symptoms.
+    
+3. RECOMMENDATIONS:
+    - Provide 5-7 specific, actionable steps.
+    - Always emphasize consulting a qualified healthcare provider.
+
+=== CRITICAL SAFETY RULES ===
+1. BE CONSERVATIVE: When in doubt, recommend medical consultation
+2. FLAG EMERGENCIES: Always mark serious symptoms as "urgent"
+3. NO DIAGNOSIS: This is preliminary assessment only, not a diagnosis
+4. EVIDENCE-BASED: Only suggest well-established possibilities
+
+=== EMERGENCY SYMPTOMS (If any of these apply, Urgency MUST be URGENT) ===
+- Chest pain or pressure
+- Difficulty breathing or shortness of breath
+- Severe bleeding that won't stop
+- Sudden severe headache
+- Sudden confusion or trouble speaking
+- Sudden weakness or numbness (especially one side)
+- Loss of consciousness or fainting
+- Severe abdominal pain
+
+Now analyze the symptoms and respond ONLY with the requested JSON structure."""
+
+# Static fallback responses, built once; only timestamp and input vary per call.
+# Shared between responses, so they must never be mutated.
+_EMERGENCY_FALLBACK = {
+    'conditions': [{
+        'name': '⚠️ IMMEDIATE MEDICAL ATTENTION REQUIRED',
+        'probability': 'N/A',
+        'description': 'Your symptoms indicate a potentially serious condition that requires immediate professional evaluation.',
+        'severity': 'serious'
+    }],
+    'urgency': 'urgent',
+    'recommendations': [
+        '🚨 Call emergency services (911/112) immediately',
+        '🏥 Go to the nearest emergency room',
+        '❌ Do NOT wait - seek help NOW',
+        '📞 If alone, call someone to help you',
+        '⏱️ Note when symptoms started',
+        '💊 Bring list of current medications if possible'
+    ],
+    'disclaimer': True,
+    'note': 'AI analysis unavailable - Emergency response activated',
+    'ai_model': 'Fallback System'
+}
+
+_ROUTINE_FALLBACK = {
+    'conditions': [{
+        'name': 'Professional Medical Evaluation Needed',
+        'probability': 'N/A',
+        'description': 'Your symptoms require in-person evaluation by a qualified healthcare provider for accurate assessment.',
+        'severity': 'unknown'
+    }],
+    'urgency': 'soon',
+    'recommendations': [
+        '📅 Schedule an appointment with your primary care physician',
+        '📝 Write down all your symptoms in detail before the appointment',
+        '⏰ Note when symptoms started and how they have changed',
+        '💊 List all medications and supplements you are currently taking',
+        '📊 Monitor symptoms and record any changes',
+        '🚨 Seek immediate care if symptoms suddenly worsen or become severe',
+    ],
+    'disclaimer': True,
+    'note': 'AI analysis temporarily unavailable - Please consult healthcare provider',
+    'ai_model': 'Fallback System'
+}
+
+class ConditionStreamParser:
+    """
+    Incrementally pull complete objects out of the "conditions" array of a
+    JSON response that is still being streamed, so each condition can be
+    forwarded before the rest of the response has been generated.
+    """
+    
+    _ARRAY_START = re.compile(r'"conditions"\s*:\s*\[')
+    
+    def __init__(self):
+        self.buffer = ''
+        self.pos = None  # scan position, set once the array has been found
+        self.depth = 0
+        self.in_string = False
+        self.escaped = False
+        self.obj_start = 0
+        self.done = False
+    
+    def feed(self, text: str) -> List[Dict]:
+        """Add streamed text and return any conditions completed by it"""
+        self.buffer += text
+        found = []
+        if self.done:
+            return found
+        
+        if self.pos is None:
+            match = self._ARRAY_START.search(self.buffer)
+            if not match:
+                return found
+            self.pos = match.end()
+        
+        buf = self.buffer
+        for i in range(self.pos, len(buf)):
+            ch = buf[i]
+            if self.in_string:
+                if self.escaped:
+                    self.escaped = False
+                elif ch == '\\':
+                    self.escaped = True
+                elif ch == '"':
+                    self.in_string = False
+            elif ch == '"':
+                self.in_string = True
+            elif ch == '{':
+                if self.depth == 0:
+                    self.obj_start = i
+                self.depth += 1
+            elif ch == '}':
+                self.depth -= 1
+                if self.depth == 0:
+                    try:
+                        found.append(orjson.loads(buf[self.obj_start:i + 1]))
+                    except orjson.JSONDecodeError:
+                        pass
+            elif ch == ']' and self.depth == 0:
+                self.done = True
+                break
+        
+        self.pos = len(buf)
+        return found
+
+GEMINI_API_ENDPOINT = os.getenv("GEMINI_API_ENDPOINT", "generativelanguage.googleapis.com")
+
 class SymptomAnalyzer:
     """LLM-based symptom analyzer using Google Gemini"""
     
@@ -117,101 +503,106 @@ class SymptomAnalyzer:
                 "GOOGLE_API_KEY not found! Please add it to a .env file or environment variables."
             )
         
-        # Configure the genai client
-        genai.configure(api_key=api_key)
+        # Configure the genai client - one long-lived gRPC channel to a fixed
+        # endpoint, reused by every request in this process
+        genai.configure(
+            api_key=api_key,
+            transport='grpc',
+            client_options={'api_endpoint': GEMINI_API_ENDPOINT}
+        )
 
         try:
             full_model_name = model_name if model_name.startswith("models/") else f"models/{model_name}"
             self.model = genai.GenerativeModel(full_model_name)
             print(f"✅ Google Gemini API initialized successfully with model: {full_model_name}")
+            
+            # Built once - the schema and sampling settings never change per request
+            self._gen_config = genai.types.GenerationConfig(
+                response_mime_type="application/json",
+                response_schema=SymptomAnalysisSchema, # Pydantic Model
+                
+                temperature=0.3,
+                top_p=0.8,
+                top_k=40,
+                max_output_tokens=1024,
+            )
+
         except Exception as e:
             raise RuntimeError(
                 "Failed to initialize Gemini model. Check GEMINI_MODEL and that your API key has access. "
                 f"Original error: {e}"
             )
             
+    def start_warm_up(self):
+        """
+        Connect the gRPC channel in the background so the first real request
+        doesn't pay the TCP + TLS handshake. Called by server entry points only,
+        so tools and tests importing this module make no network calls.
+        """
+        threading.Thread(target=self._warm_up, name='gemini-warmup', daemon=True).start()
+
+    def _warm_up(self):
+        """Open the gRPC channel with a cheap count_tokens call"""
+        try:
+            self.model.count_tokens("ping", request_options={'timeout': 10})
+            print("✅ Gemini connection warmed up")
+        except Exception as e:
+            print(f"⚠️ Gemini warm-up failed (will connect on first request): {str(e)}")
+            
     def analyze_symptoms(self, data: Dict) -> Dict:
         """
         Main analysis function - analyzes symptoms using Google Gemini with Structured Output
         """
+        for event, payload in self.stream_analysis(data, parse_conditions=False):
+            if event == 'result':
+                return payload
+
+    def stream_analysis(self, data: Dict, parse_conditions: bool = True) -> Iterator[Tuple[str, Dict]]:
+        """
+        Stream the analysis as Gemini generates it.
+        Yields ('condition', condition) for each condition as soon as it is complete,
+        then exactly one ('result', analysis) with the full parsed (or fallback) analysis.
+        With parse_conditions=False only the final ('result', analysis) is yielded.
+        """
         prompt = self._build_prompt(data)
         
         try:
-            print("🤖 Sending request to Gemini AI with Structured Output...")
+            print("🤖 Streaming request to Gemini AI with Structured Output...")
 
             response = self.model.generate_content(
                 prompt,
-                config=genai.types.GenerateContentConfig(
-                    response_mime_type="application/json",
-                    response_schema=SymptomAnalysisSchema, # Pydantic Model
-                    
-                    temperature=0.3,
-                    top_p=0.8,
-                    top_k=40,
-                    max_output_tokens=1024,
-                )
+                generation_config=self._gen_config,
+                stream=True
             )
             
+            conditions = ConditionStreamParser() if parse_conditions else None
+            chunks = []
+            for chunk in response:
+                chunks.append(chunk.text)
+                if conditions is not None:
+                    for condition in conditions.feed(chunk.text):
+                        yield 'condition', condition
+            
             print("✅ Received structured response from Gemini AI")
             
-            response_text = response.text 
+            response_text = ''.join(chunks)
             
             print(f"🧠 Gemini Response (preview): {response_text[:300]}...")
             
-            return self._parse_llm_response(response_text, data)
-
-
         except Exception as e:
             print(f"❌ LLM Error: {str(e)}")
             print(f"Full traceback:\n{traceback.format_exc()}")
-            return self._fallback_analysis(data)
+            yield 'result', self._fallback_analysis(data)
+            return
+        
+        yield 'result', self._parse_llm_response(response_text, data)
 
     def _build_prompt(self, data: Dict) -> str:
         """Build comprehensive prompt for LLM"""
-        prompt = f"""You are an expert medical AI assistant providing preliminary symptom assessment for EDUCATIONAL PURPOSES ONLY.
-
-=== PATIENT INFORMATION ===
-Symptoms: {data.get('symptoms', 'Not provided')}
-Age: {data.get('age', 'Not provided')}
-Gender: {data.get('gender', 'Not provided')}
-Duration: {data.get('duration', 'Not provided')}
-Severity Level: {data.get('severity', 'Not provided')}
-
-=== YOUR TASK ===
-Analyze the symptoms and provide a preliminary assessment. The output MUST strictly adhere to the provided JSON Schema (SymptomAnalysisSchema).
-
-=== ANALYSIS GUIDELINES ===
-
-1. POSSIBLE CONDITIONS:
-    - List 2-4 most probable conditions based on symptoms
-    - Order by probability (most likely first)
-    - Use the defined probability and severity levels only.
-
-2. URGENCY CLASSIFICATION:
-    - Use "urgent", "soon", or "routine". Classify based on the severity of the most probable condition and the presence of emergency symptoms.
-    
-3. RECOMMENDATIONS:
-    - Provide 5-7 specific, actionable steps.
-    - Always emphasize consulting a qualified healthcare provider.
-
-=== CRITICAL SAFETY RULES ===
-1. BE CONSERVATIVE: When in doubt, recommend medical consultation
-2. FLAG EMERGENCIES: Always mark serious symptoms as "urgent"
-3. NO DIAGNOSIS: This is preliminary assessment only, not a diagnosis
-4. EVIDENCE-BASED: Only suggest well-established possibilities
-
-=== EMERGENCY SYMPTOMS (If any of these apply, Urgency MUST be URGENT) ===
-- Chest pain or pressure
-- Difficulty breathing or shortness of breath
-- Severe bleeding that won't stop
-- Sudden severe headache
-- Sudden confusion or trouble speaking
-- Sudden weakness or numbness (especially one side)
-- Loss of consciousness or fainting
-- Severe abdominal pain
-
-Now analyze the symptoms and respond ONLY with the requested JSON structure."""
-        return prompt
+        return _PROMPT_TEMPLATE.format_map({
+            field: data.get(field, 'Not provided')
+            for field in _PROMPT_FIELDS
+        })
     
     def _parse_llm_response(self, response: str, original_data: Dict) -> Dict:
         """
@@ -221,7 +612,7 @@ Now analyze the symptoms and respond ONLY with the requested JSON structure."""
         try:
             response = response.strip()
             
-            parsed = json.loads(response)
+            parsed = orjson.loads(response)
             
             if not all(key in parsed for key in ['conditions', 'urgency', 'recommendations']):
                 raise ValueError("Missing required top-level fields in AI response structure")
@@ -235,7 +626,7 @@ Now analyze the symptoms and respond ONLY with the requested JSON structure."""
                 parsed['urgency'] = 'routine'
             
             return {
-                'timestamp': datetime.utcnow().isoformat(),
+                'timestamp': iso_now(),
                 'input': original_data,
                 'conditions': parsed.get('conditions', []),
                 'urgency': parsed.get('urgency', 'routine'),
@@ -244,7 +635,7 @@ Now analyze the symptoms and respond ONLY with the requested JSON structure."""
                 'ai_model': os.getenv('GEMINI_MODEL', 'Google Gemini')
             }
                 
-        except (json.JSONDecodeError, ValueError, KeyError) as e:
+        except (orjson.JSONDecodeError, ValueError, KeyError) as e:
             print(f"⚠️ JSON Parse Error: {str(e)}")
             print(f"Raw response: {response[:200]}...")
             
@@ -253,68 +644,12 @@ Now analyze the symptoms and respond ONLY with the requested JSON structure."""
     
     def _fallback_analysis(self, data: Dict) -> Dict:
         """Fallback analysis if LLM fails"""
-        symptoms_lower = data.get('symptoms', '').lower()
-        
-        emergency_keywords = [
-            'chest pain', 'chest pressure', 'heart attack',
-            'difficulty breathing', "can't breathe", 'shortness of breath',
-            'severe bleeding', 'bleeding heavily', 'blood loss',
-            'stroke', 'can\'t move arm', 'face drooping',
-            'seizure', 'convulsion',
-            'unconscious', 'passed out', 'fainted',
-            'severe headache', 'worst headache',
-            'coughing blood', 'vomiting blood',
-            'severe abdominal pain', 'severe stomach pain'
-        ]
-        
-        is_emergency = any(keyword in symptoms_lower for keyword in emergency_keywords)
-        
-        if is_emergency:
-            return {
-                'timestamp': datetime.utcnow().isoformat(),
-                'input': data,
-                'conditions': [{
-                    'name': '⚠️ IMMEDIATE MEDICAL ATTENTION REQUIRED',
-                    'probability': 'N/A',
-                    'description': 'Your symptoms indicate a potentially serious condition that requires immediate professional evaluation.',
-                    'severity': 'serious'
-                }],
-                'urgency': 'urgent',
-                'recommendations': [
-                    '🚨 Call emergency services (911/112) immediately',
-                    '🏥 Go to the nearest emergency room',
-                    '❌ Do NOT wait - seek help NOW',
-                    '📞 If alone, call someone to help you',
-                    '⏱️ Note when symptoms started',
-                    '💊 Bring list of current medications if possible'
-                ],
-                'disclaimer': True,
-                'note': 'AI analysis unavailable - Emergency response activated',
-                'ai_model': 'Fallback System'
-            }
-        else:
-            return {
-                'timestamp': datetime.utcnow().isoformat(),
-                'input': data,
-                'conditions': [{
-                    'name': 'Professional Medical Evaluation Needed',
-                    'probability': 'N/A',
-                    'description': 'Your symptoms require in-person evaluation by a qualified healthcare provider for accurate assessment.',
-                    'severity': 'unknown'
-                }],
-                'urgency': 'soon',
-                'recommendations': [
-                    '📅 Schedule an appointment with your primary care physician',
-                    '📝 Write down all your symptoms in detail before the appointment',
-                    '⏰ Note when symptoms started and how they have changed',
-                    '💊 List all medications and supplements you are currently taking',
-                    '📊 Monitor symptoms and record any changes',
-                    '🚨 Seek immediate care if symptoms suddenly worsen or become severe',
-                ],
-                'disclaimer': True,
-                'note': 'AI analysis temporarily unavailable - Please consult healthcare provider',
-                'ai_model': 'Fallback System'
-            }
+        symptoms_lower = data.get('_symptoms_lower') or data.get('symptoms', '').lower()
+        
+        is_emergency = bool(find_emergency_keywords(symptoms_lower))
+        
+        template = _EMERGENCY_FALLBACK if is_emergency else _ROUTINE_FALLBACK
+        return {'timestamp': iso_now(), 'input': data, **template}
 
 # ==================== INITIALIZE ANALYZER ====================
 
@@ -329,35 +664,190 @@ except Exception as e:
     print("3. Get free key from: https://aistudio.google.com/app/apikey")
     analyzer = None
 
+# ==================== ANALYSIS CACHE ====================
+
+_WORD_RE = re.compile(r"[a-z0-9']+")
+
+# Words that carry no clinical meaning. Negations ("no", "not", "without"),
+# laterality, degree and time words are deliberately absent.
+_FILLER_WORDS = frozenset({
+    'a', 'an', 'the', 'i', "i'm", 'im', "i've", 'ive', 'my', 'me',
+    'have', 'has', 'had', 'am', 'is', 'are', 'was', 'were', 'be', 'been',
+    'and', 'also', 'just', 'it', 'its', "it's", 'that', 'this', 'so',
+    'um', 'uh', 'please', 'hi', 'hello'
+})
+
+class AnalysisCache:
+    """
+    LRU cache for LLM analyses, keyed on the canonical form of a request.
+    Requests that differ only in case, punctuation or filler words share an
+    entry (see _make_guard); the stored exact-payload hash tells a verbatim
+    repeat (HIT-EXACT) apart from such a rewording (HIT-NORMALIZED).
+    """
+    
+    def __init__(self, max_entries: int = 1024, ttl_seconds: int = 3600):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        # guard -> (analysis, stored_at, exact key), kept in LRU order
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+    
+    @staticmethod
+    def _normalize(data: Dict) -> str:
+        return data.get('_symptoms_lower') or data.get('symptoms', '').lower().strip()
+    
+    def _make_key(self, data: Dict) -> str:
+        payload = {
+            's': self._normalize(data),
+            'a': data.get('age'),
+            'g': data.get('gender'),
+            'd': data.get('duration'),
+            'sev': data.get('severity')
+        }
+        return sha256(orjson.dumps(payload, option=orjson.OPT_SORT_KEYS)).hexdigest()
+    
+    def _make_guard(self, data: Dict) -> Tuple:
+        """
+        Canonical form of a request: the structured fields plus the symptoms'
+        content words in order. Only filler words, case and punctuation are
+        dropped, so "fever, no cough" never matches "fever and cough" and
+        "left arm pain" never matches "right arm pain".
+        """
+        content_words = tuple(
+            word for word in _WORD_RE.findall(self._normalize(data))
+            if word not in _FILLER_WORDS
+        )
+        return (data.get('age'), data.get('gender'), data.get('duration'),
+                data.get('severity'), content_words)
+    
+    def get(self, data: Dict) -> Tuple[Optional[Dict], str]:
+        """Return (analysis, cache_status) where status is HIT-EXACT, HIT-NORMALIZED or MISS"""
+        guard = self._make_guard(data)
+        
+        with self._lock:
+            entry = self._entries.get(guard)
+            if entry is None:
+                return None, 'MISS'
+            if time.time() - entry[1] > self.ttl_seconds:
+                del self._entries[guard]
+                return None, 'MISS'
+            self._entries.move_to_end(guard)
+        
+        status = 'HIT-EXACT' if entry[2] == self._make_key(data) else 'HIT-NORMALIZED'
+        return entry[0], status
+    
+    def put(self, data: Dict, analysis: Dict):
+        """Store an analysis, evicting the least recently used entry when full"""
+        guard = self._make_guard(data)
+        key = self._make_key(data)
+        
+        with self._lock:
+            self._entries[guard] = (analysis, time.time(), key)
+            self._entries.move_to_end(guard)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+analysis_cache = AnalysisCache()
+
 # ==================== API ENDPOINTS ====================
 
+@app.before_request
+def reject_oversized_body():
+    """Refuse bodies over MAX_CONTENT_LENGTH from the header alone, before any parsing"""
+    if request.content_length is not None and request.content_length > app.config['MAX_CONTENT_LENGTH']:
+        return payload_too_large(None)
+
+# Static payloads are serialized once; monitors revalidating with
+# If-None-Match get an empty 304 instead of the body
+_HOME_JSON = orjson.dumps({
+    'name': 'Healthcare Symptom Checker API',
+    'version': '1.0.0',
+    'status': 'running',
+    'ai_model': os.getenv('GEMINI_MODEL', 'Google Gemini'),
+    'endpoints': {
+        'health': '/health',
+        'analyze': '/api/analyze (POST)',
+        'analyze_stream': '/api/analyze/stream (POST, NDJSON)',
+        'history': '/api/history/<session_id> (GET)'
+    },
+    'documentation': 'See README.md for full documentation'
+})
+_HOME_ETAG = md5(_HOME_JSON).hexdigest()
+
+# (second, body, etag) - /health is re-serialized at most once per second
+_health_cache = (None, b'', '')
+
+def _cached_json_response(body: bytes, etag: str, max_age: int) -> Response:
+    """Serve pre-encoded JSON, answering matching conditional requests with 304"""
+    headers = {'ETag': f'"{etag}"', 'Cache-Control': f'public, max-age={max_age}'}
+    if request.if_none_match.contains(etag):
+        return Response(status=304, headers=headers)
+    return Response(body, status=200, mimetype='application/json', headers=headers)
+
 @app.route('/', methods=['GET'])
 def home():
     """Root endpoint - API information"""
-    return jsonify({
-        'name': 'Healthcare Symptom Checker API',
-        'version': '1.0.0',
-        'status': 'running',
-        'ai_model': os.getenv('GEMINI_MODEL', 'Google Gemini'),
-        'endpoints': {
-            'health': '/health',
-            'analyze': '/api/analyze (POST)',
-            'history': '/api/history/<session_id> (GET)'
-        },
-        'documentation': 'See README.md for full documentation'
-    })
+    return _cached_json_response(_HOME_JSON, _HOME_ETAG, max_age=60)
 
 @app.route('/health', methods=['GET'])
 def health_check():
     """Health check endpoint - verify API is working"""
-    return jsonify({
-        'status': 'healthy',
-        'ai_status': 'ready' if analyzer else 'not configured',
-        'ai_model': os.getenv('GEMINI_MODEL', 'Google Gemini'),
-        'database': 'connected',
-        'timestamp': datetime.utcnow().isoformat(),
-        'message': 'All systems operational' if analyzer else 'Configure GOOGLE_API_KEY'
-    }), 200
+    global _health_cache
+    second = int(time.time())
+    
+    if _health_cache[0] != second:
+        body = orjson.dumps({
+            'status': 'healthy',
+            'ai_status': 'ready' if analyzer else 'not configured',
+            'ai_model': os.getenv('GEMINI_MODEL', 'Google Gemini'),
+            'database': 'connected',
+            'timestamp': iso_now(),
+            'message': 'All systems operational' if analyzer else 'Configure GOOGLE_API_KEY'
+        })
+        _health_cache = (second, body, md5(body).hexdigest())
+    
+    _, body, etag = _health_cache
+    return _cached_json_response(body, etag, max_age=1)
+
+def _validate_analysis_request(data: Optional[Dict]):
+    """
+    Validate an analysis request body in place (symptoms are stripped once and
+    written back). Returns an error response tuple, or None if the request is valid.
+    """
+    # Validate input exists
+    if not data or not isinstance(data, dict):
+        return jsonify({
+            'error': 'No data provided',
+            'message': 'Request body must contain a JSON object'
+        }), 400
+    
+    # Validate symptoms field
+    symptoms = data.get('symptoms')
+    symptoms = symptoms.strip() if isinstance(symptoms, str) else ''
+    if not symptoms:
+        return jsonify({
+            'error': 'Symptoms field is required',
+            'message': 'Please provide a "symptoms" field in your request'
+        }), 400
+    data['symptoms'] = symptoms
+    # Lowercased once here and shared by the cache key, keyword checks and fallback
+    data['_symptoms_lower'] = symptoms.lower()
+    
+    # Validate minimum length
+    if len(symptoms) < 10:
+        return jsonify({
+            'error': 'Symptoms description too short',
+            'message': 'Please provide more detailed symptom description (at least 10 characters)'
+        }), 400
+    
+    # Validate maximum length
+    if len(symptoms) > 2000:
+        return jsonify({
+            'error': 'Symptoms description too long',
+            'message': 'Please limit symptom description to 2000 characters'
+        }), 400
+    
+    return None
 
 @app.route('/api/analyze', methods=['POST', 'OPTIONS'])
 @limiter.limit("10 per minute")
@@ -376,35 +866,11 @@ def api_analyze():
     
     try:
         # Get JSON data from request
-        data = request.get_json()
-        
-        # Validate input exists
-        if not data:
-            return jsonify({
-                'error': 'No data provided',
-                'message': 'Request body must contain JSON data'
-            }), 400
-        
-        # Validate symptoms field
-        if 'symptoms' not in data or not data['symptoms'].strip():
-            return jsonify({
-                'error': 'Symptoms field is required',
-                'message': 'Please provide a "symptoms" field in your request'
-            }), 400
-        
-        # Validate minimum length
-        if len(data['symptoms'].strip()) < 10:
-            return jsonify({
-                'error': 'Symptoms description too short',
-                'message': 'Please provide more detailed symptom description (at least 10 characters)'
-            }), 400
-        
-        # Validate maximum length
-        if len(data['symptoms']) > 2000:
-            return jsonify({
-                'error': 'Symptoms description too long',
-                'message': 'Please limit symptom description to 2000 characters'
-            }), 400
+        data = request.get_json(silent=True, cache=False)
+        
+        error = _validate_analysis_request(data)
+        if error:
+            return error
         
         # Log analysis start
         print(f"\n{'='*60}")
@@ -416,17 +882,32 @@ def api_analyze():
         print(f"Severity: {data.get('severity', 'N/A')}")
         print(f"{'='*60}\n")
         
-        # Analyze symptoms using AI
-        analysis = analyzer.analyze_symptoms(data)
+        # Reuse a cached analysis for identical or paraphrased requests
+        cached, cache_status = analysis_cache.get(data)
+        if cached:
+            print(f"⚡ Analysis cache {cache_status}")
+            analysis = {**cached, 'timestamp': iso_now(), 'input': data}
+        else:
+            # Analyze symptoms using AI
+            analysis = analyzer.analyze_symptoms(data)
+            
+            # Fallback responses are never cached so the next request retries the LLM
+            if not analysis.get('ai_model', '').startswith('Fallback System'):
+                analysis_cache.put(data, analysis)
         
         # Store in database
         store_query(data, analysis)
         
+        # Internal field - keep it out of the echoed input
+        data.pop('_symptoms_lower', None)
+        
         print(f"✅ Analysis completed successfully")
         print(f"Urgency: {analysis.get('urgency', 'unknown')}")
         print(f"Conditions found: {len(analysis.get('conditions', []))}\n")
         
-        return jsonify(analysis), 200
+        response = jsonify(analysis)
+        response.headers['X-Cache'] = cache_status
+        return response, 200
         
     except Exception as e:
         print(f"❌ Error in api_analyze: {str(e)}")
@@ -438,42 +919,109 @@ def api_analyze():
             'details': str(e) if app.debug else 'Enable debug mode for details'
         }), 500
 
+@app.route('/api/analyze/stream', methods=['POST', 'OPTIONS'])
+@limiter.limit("10 per minute")
+def api_analyze_stream():
+    """
+    Streaming symptom analysis endpoint.
+    Responds with NDJSON: one {"type": "condition"} line per condition as Gemini
+    produces it, then a final {"type": "result"} line with the full analysis.
+    If the final analysis doesn't match what was streamed (e.g. the response
+    failed to parse and the fallback was used), a {"type": "reset"} line comes
+    first and clients must discard the conditions they already received.
+    """
+    if request.method == 'OPTIONS':
+        return '', 204
+    
+    # Check if AI is available
+    if not analyzer:
+        return jsonify({
+            'error': 'AI service not available',
+            'message': 'Google Gemini API not configured. Please check GOOGLE_API_KEY in .env file.',
+            'help': 'Get free API key from: https://aistudio.google.com/app/apikey'
+        }), 503
+    
+    try:
+        data = request.get_json(silent=True, cache=False)
+        error = _validate_analysis_request(data)
+        if error:
+            return error
+        
+        print(f"🔍 NEW STREAMING ANALYSIS REQUEST - Symptoms: {data['symptoms'][:100]}...")
+        
+        cached, cache_status = analysis_cache.get(data)
+        
+    except Exception as e:
+        print(f"❌ Error in api_analyze_stream: {str(e)}")
+        print(f"Traceback: {traceback.format_exc()}")
+        
+        return jsonify({
+            'error': 'Internal server error',
+            'message': 'Unable to process request. Please try again.',
+            'details': str(e) if app.debug else 'Enable debug mode for details'
+        }), 500
+    
+    def generate():
+        if cached:
+            print(f"⚡ Analysis cache {cache_status}")
+            analysis = {**cached, 'timestamp': iso_now(), 'input': data}
+        else:
+            analysis = None
+            streamed = []
+            for event, payload in analyzer.stream_analysis(data):
+                if event == 'condition':
+                    streamed.append(payload)
+                    yield orjson.dumps({'type': 'condition', 'condition': payload}) + b'\n'
+                else:
+                    analysis = payload
+            
+            if streamed and analysis.get('conditions') != streamed:
+                yield orjson.dumps({'type': 'reset'}) + b'\n'
+            
+            if not analysis.get('ai_model', '').startswith('Fallback System'):
+                analysis_cache.put(data, analysis)
+        
+        store_query(data, analysis)
+        data.pop('_symptoms_lower', None)
+        yield orjson.dumps({'type': 'result', 'analysis': analysis}) + b'\n'
+    
+    response = Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+    response.headers['X-Cache'] = cache_status
+    return response
+
 @app.route('/api/history/<session_id>', methods=['GET'])
 @limiter.limit("30 per minute")
 def get_history(session_id):
     """Get query history for a specific session"""
     try:
-        conn = sqlite3.connect('symptom_checker.db')
-        c = conn.cursor()
-        
-        c.execute('''
-            SELECT timestamp, symptoms, conditions, urgency_level, age, gender
-            FROM symptom_queries
-            WHERE session_id = ?
-            ORDER BY timestamp DESC
-            LIMIT 10
-        ''', (session_id,))
-        
-        rows = c.fetchall()
-        conn.close()
+        with db_lock:
+            rows = DB.execute('''
+                SELECT timestamp, symptoms, conditions, urgency_level, age, gender
+                FROM symptom_queries
+                WHERE session_id = ?
+                ORDER BY timestamp DESC, id DESC
+                LIMIT 10
+            ''', (session_id,)).fetchall()
         
-        # Format history
+        # Format history - conditions are already stored as JSON, so splice
+        # them into the response as-is instead of decoding and re-encoding
         history = []
         for row in rows:
-            history.append({
+            entry = orjson.dumps({
                 'timestamp': row[0],
                 'symptoms': row[1][:100] + '...' if len(row[1]) > 100 else row[1],
-                'conditions': json.loads(row[2]) if row[2] else [],
                 'urgency': row[3],
                 'age': row[4],
                 'gender': row[5]
             })
+            history.append(entry[:-1] + b',"conditions":' + (row[2] or '[]').encode() + b'}')
         
-        return jsonify({
-            'session_id': session_id,
-            'count': len(history),
-            'history': history
-        }), 200
+        body = (
+            b'{"session_id":' + orjson.dumps(session_id) +
+            b',"count":' + str(len(history)).encode() +
+            b',"history":[' + b','.join(history) + b']}'
+        )
+        return Response(body, status=200, mimetype='application/json')
         
     except Exception as e:
         print(f"❌ Error fetching history: {str(e)}")
@@ -487,27 +1035,22 @@ def get_history(session_id):
 def get_stats():
     """Get overall statistics"""
     try:
-        conn = sqlite3.connect('symptom_checker.db')
-        c = conn.cursor()
-        
-        # Get total queries
-        c.execute('SELECT COUNT(*) FROM symptom_queries')
-        total_queries = c.fetchone()[0]
-        
-        # Get queries by urgency
-        c.execute('''
-            SELECT urgency_level, COUNT(*) 
-            FROM symptom_queries 
-            GROUP BY urgency_level
-        ''')
-        urgency_stats = dict(c.fetchall())
+        with db_lock:
+            # Total and per-urgency counts in a single pass
+            total_queries, urgent, soon, routine = DB.execute('''
+                SELECT COUNT(*),
+                       COALESCE(SUM(CASE WHEN urgency_level = 'urgent' THEN 1 ELSE 0 END), 0),
+                       COALESCE(SUM(CASE WHEN urgency_level = 'soon' THEN 1 ELSE 0 END), 0),
+                       COALESCE(SUM(CASE WHEN urgency_level = 'routine' THEN 1 ELSE 0 END), 0)
+                FROM symptom_queries
+            ''').fetchone()
         
-        conn.close()
+        urgency_stats = {'urgent': urgent, 'soon': soon, 'routine': routine}
         
         return jsonify({
             'total_queries': total_queries,
             'urgency_breakdown': urgency_stats,
-            'timestamp': datetime.utcnow().isoformat()
+            'timestamp': iso_now()
         }), 200
         
     except Exception as e:
@@ -516,38 +1059,104 @@ def get_stats():
 
 # ==================== DATABASE HELPER ====================
 
+def _db_value(value):
+    """Coerce a client-supplied field to something SQLite can bind"""
+    if value is None or isinstance(value, (str, int, float)):
+        return value
+    # Lists and dicts are stored as JSON rather than their Python repr
+    return orjson.dumps(value).decode()
+
 def store_query(input_data: Dict, analysis: Dict):
-    """Store query and analysis in database"""
+    """Queue query and analysis for storage in database"""
     try:
-        conn = sqlite3.connect('symptom_checker.db')
-        c = conn.cursor()
-        
-        c.execute('''
-            INSERT INTO symptom_queries 
-            (timestamp, symptoms, age, gender, duration, severity, 
-             conditions, recommendations, urgency_level, session_id)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        ''', (
-            datetime.utcnow().isoformat(),
+        session_id = input_data.get('session_id') or ''
+        row = (
+            session_id if isinstance(session_id, str) else str(session_id),
+            iso_now(),
             input_data.get('symptoms', ''),
-            input_data.get('age'),
-            input_data.get('gender'),
-            input_data.get('duration'),
-            input_data.get('severity'),
-            json.dumps(analysis.get('conditions', [])),
-            json.dumps(analysis.get('recommendations', [])),
-            analysis.get('urgency', 'routine'),
-            input_data.get('session_id', '')
-        ))
-        
-        conn.commit()
-        conn.close()
+            _db_value(input_data.get('age')),
+            _db_value(input_data.get('gender')),
+            _db_value(input_data.get('duration')),
+            _db_value(input_data.get('severity')),
+            orjson.dumps(analysis.get('conditions', [])).decode(),
+            orjson.dumps(analysis.get('recommendations', [])).decode(),
+            analysis.get('urgency', 'routine')
+        )
         
-        print("💾 Query stored in database successfully")
+        # Non-blocking: the writer thread commits it with the next batch
+        _write_q.put(row)
         
     except Exception as e:
         print(f"❌ Database storage error: {str(e)}")
 
+_INSERT_QUERY_SQL = '''
+    INSERT INTO symptom_queries 
+    (id, timestamp, symptoms, age, gender, duration, severity, 
+     conditions, recommendations, urgency_level, session_id)
+    VALUES ((SELECT COALESCE(MAX(id), 0) + 1 FROM symptom_queries WHERE session_id = ?1),
+            ?2, ?3, ?4, ?5, ?6, ?7, ?8, ?9, ?10, ?1)
+'''
+_WRITE_BATCH_SIZE = 32
+_WRITE_BATCH_WAIT = 0.1  # seconds
+_WRITER_STOP = object()  # queued at exit to make the writer flush and return
+
+_write_q = queue.Queue()
+
+def _write_batch(batch: List[Tuple]):
+    """
+    Insert a batch of rows in one transaction so they share a single commit.
+    If the batch fails it is retried row by row, so one bad row only loses itself.
+    """
+    with db_lock:
+        try:
+            DB.execute('BEGIN')
+            DB.executemany(_INSERT_QUERY_SQL, batch)
+            DB.execute('COMMIT')
+            print(f"💾 Stored {len(batch)} queries in database successfully")
+            return
+        except Exception as e:
+            if DB.in_transaction:
+                DB.execute('ROLLBACK')
+            print(f"⚠️ Batch insert failed, retrying row by row: {str(e)}")
+        
+        for row in batch:
+            try:
+                DB.execute(_INSERT_QUERY_SQL, row)
+            except Exception as e:
+                print(f"❌ Database storage error: {str(e)}")
+
+def _writer_loop():
+    """Drain the write queue, committing every 32 rows or 100 ms, until stopped"""
+    stopping = False
+    while not stopping:
+        item = _write_q.get()
+        if item is _WRITER_STOP:
+            break
+        batch = [item]
+        deadline = time.monotonic() + _WRITE_BATCH_WAIT
+        while len(batch) < _WRITE_BATCH_SIZE:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = _write_q.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if item is _WRITER_STOP:
+                stopping = True
+                break
+            batch.append(item)
+        _write_batch(batch)
+
+def _stop_writer():
+    """Let the writer finish every queued and in-flight row before the process exits"""
+    _write_q.put(_WRITER_STOP)
+    _writer_thread.join(timeout=10)
+
+_writer_thread = threading.Thread(target=_writer_loop, name='db-writer', daemon=True)
+_writer_thread.start()
+atexit.register(_stop_writer)
+
 # ==================== ERROR HANDLERS ====================
 
 @app.errorhandler(429)
@@ -559,6 +1168,15 @@ def ratelimit_handler(e):
         'retry_after': '1 minute'
     }), 429
 
+@app.errorhandler(413)
+def payload_too_large(e):
+    """Handle request bodies over MAX_CONTENT_LENGTH"""
+    limit_kb = app.config['MAX_CONTENT_LENGTH'] // 1024
+    return jsonify({
+        'error': 'Request too large',
+        'message': f'Request body exceeds the {limit_kb} KB limit. Please shorten your symptom description.'
+    }), 413
+
 @app.errorhandler(500)
 def internal_error(e):
     """Handle internal server errors"""
@@ -578,6 +1196,7 @@ def not_found(e):
             'home': '/',
             'health': '/health',
             'analyze': '/api/analyze (POST)',
+            'analyze_stream': '/api/analyze/stream (POST, NDJSON)',
             'history': '/api/history/<session_id> (GET)',
             'stats': '/api/stats (GET)'
         }
@@ -609,6 +1228,9 @@ if __name__ == '__main__':
         print("🚀 Ready to analyze symptoms!\n")
         print("="*70 + "\n")
     
+    if analyzer:
+        analyzer.start_warm_up()
+    
     # Run Flask development server
     app.run(
         debug=True,  # Enable debug mode for development
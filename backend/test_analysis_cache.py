@@ -0,0 +1,64 @@
+from app import AnalysisCache
+
+ANALYSIS = {"conditions": [], "urgency": "routine", "recommendations": []}
+
+
+def request(symptoms, **fields):
+    data = {"symptoms": symptoms, "age": 30, "gender": "female",
+            "duration": "2 days", "severity": "mild"}
+    data.update(fields)
+    return data
+
+
+def test_exact_hit():
+    cache = AnalysisCache()
+    cache.put(request("Fever and cough"), ANALYSIS)
+    assert cache.get(request("Fever and cough")) == (ANALYSIS, "HIT-EXACT")
+
+
+def test_rewording_hit():
+    cache = AnalysisCache()
+    cache.put(request("I have a fever and a cough"), ANALYSIS)
+    assert cache.get(request("fever, cough.")) == (ANALYSIS, "HIT-NORMALIZED")
+
+
+def test_miss_on_negation():
+    cache = AnalysisCache()
+    cache.put(request("fever and cough"), ANALYSIS)
+    assert cache.get(request("fever, no cough")) == (None, "MISS")
+
+
+def test_miss_on_laterality():
+    cache = AnalysisCache()
+    cache.put(request("left arm pain"), ANALYSIS)
+    assert cache.get(request("right arm pain")) == (None, "MISS")
+
+
+def test_miss_on_structured_fields():
+    cache = AnalysisCache()
+    cache.put(request("fever and cough"), ANALYSIS)
+    assert cache.get(request("fever and cough", age=70)) == (None, "MISS")
+    assert cache.get(request("fever and cough", severity="severe")) == (None, "MISS")
+
+
+def test_ttl_expiry(monkeypatch):
+    cache = AnalysisCache(ttl_seconds=60)
+    now = [1000.0]
+    monkeypatch.setattr("app.time.time", lambda: now[0])
+    cache.put(request("fever"), ANALYSIS)
+    now[0] += 60
+    assert cache.get(request("fever"))[1] == "HIT-EXACT"
+    now[0] += 1
+    assert cache.get(request("fever")) == (None, "MISS")
+    assert cache.get(request("fever")) == (None, "MISS")
+
+
+def test_lru_eviction():
+    cache = AnalysisCache(max_entries=2)
+    cache.put(request("fever"), ANALYSIS)
+    cache.put(request("cough"), ANALYSIS)
+    cache.get(request("fever"))
+    cache.put(request("rash"), ANALYSIS)
+    assert cache.get(request("cough")) == (None, "MISS")
+    assert cache.get(request("fever"))[1] == "HIT-EXACT"
+    assert cache.get(request("rash"))[1] == "HIT-EXACT"
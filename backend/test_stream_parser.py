@@ -0,0 +1,68 @@
+import json
+import random
+
+from app import ConditionStreamParser
+
+RESPONSE = {
+    "conditions": [
+        {"name": "Migraine {with aura}", "probability": "High",
+         "description": "Says \"throbbing\" pain \\ one side ] of the head.", "severity": "moderate"},
+        {"name": "Tension headache", "probability": "Moderate",
+         "description": "Band-like pressure.", "severity": "mild"}
+    ],
+    "urgency": "soon",
+    "recommendations": ["Rest in a dark room", "See a doctor if it worsens"]
+}
+
+
+def feed_in_pieces(text, cuts):
+    parser = ConditionStreamParser()
+    found = []
+    start = 0
+    for cut in sorted(cuts) + [len(text)]:
+        found += parser.feed(text[start:cut])
+        start = cut
+    return found
+
+
+def test_conditions_streamed_in_one_chunk():
+    text = json.dumps(RESPONSE)
+    assert feed_in_pieces(text, []) == RESPONSE["conditions"]
+
+
+def test_conditions_streamed_character_by_character():
+    text = json.dumps(RESPONSE)
+    assert feed_in_pieces(text, list(range(1, len(text)))) == RESPONSE["conditions"]
+
+
+def test_conditions_streamed_at_random_split_points():
+    text = json.dumps(RESPONSE)
+    rng = random.Random(1234)
+    for _ in range(200):
+        cuts = rng.sample(range(1, len(text)), rng.randint(1, 20))
+        assert feed_in_pieces(text, cuts) == RESPONSE["conditions"]
+
+
+def test_each_condition_emitted_as_soon_as_it_closes():
+    text = json.dumps(RESPONSE)
+    first_end = text.index('"severity": "moderate"}') + len('"severity": "moderate"}')
+    parser = ConditionStreamParser()
+    assert parser.feed(text[:first_end - 1]) == []
+    assert parser.feed(text[first_end - 1:first_end]) == [RESPONSE["conditions"][0]]
+
+
+def test_conditions_key_after_other_fields():
+    text = json.dumps({"urgency": "routine", "recommendations": ["x"],
+                       "conditions": RESPONSE["conditions"]})
+    assert feed_in_pieces(text, [5, 40, 90]) == RESPONSE["conditions"]
+
+
+def test_objects_after_conditions_array_are_ignored():
+    text = json.dumps({"conditions": [], "extra": [{"name": "not a condition"}]})
+    assert feed_in_pieces(text, [3, 17]) == []
+
+
+def test_truncated_response_yields_only_complete_conditions():
+    text = json.dumps(RESPONSE)
+    cut = text.index("Tension headache")
+    assert feed_in_pieces(text[:cut], [10]) == [RESPONSE["conditions"][0]]
@@ -0,0 +1,14 @@
+"""
+WSGI entry point for production servers
+
+Gemini round-trips dominate request time, so run under gevent workers:
+    gunicorn -k gevent -w 4 --worker-connections 200 wsgi:app
+
+Don't use --preload: the app must be imported inside each patched worker.
+"""
+
+from app import app, analyzer
+
+# Only server processes pre-connect to Gemini
+if analyzer:
+    analyzer.start_warm_up()